@@ -1,12 +1,127 @@
-import json
-from copy import deepcopy
+import os
+import sys
+from itertools import starmap
+from types import MappingProxyType
 
-PROM_DS = {"type": "prometheus", "uid": "${DS_PROMETHEUS}"}
+import orjson
 
-def row(panel_id: int, title: str, y: int) -> dict:
+# Recursively turns dicts into read-only mappings and lists into tuples.
+def _freeze(value: object) -> object:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+PROM_DS = _freeze({"type": "prometheus", "uid": "${DS_PROMETHEUS}"})
+
+# Grafana query refIds: "A".."Z".
+_REFIDS = tuple(map(chr, range(65, 91)))
+
+# Shared panel fragments. They are frozen so every panel can reference the
+# same objects without copying them or risking cross-panel mutation.
+_STAT_DEFAULT_THRESHOLDS = _freeze([
+    {"color": "green", "value": None},
+    {"color": "red", "value": 1},
+])
+
+_STAT_OPTIONS = _freeze({
+    "colorMode": "value",
+    "graphMode": "none",
+    "justifyMode": "center",
+    "orientation": "horizontal",
+    "reduceOptions": {
+        "calcs": ["lastNotNull"],
+        "fields": "",
+        "values": False,
+    },
+    "textMode": "auto",
+})
+
+_TS_DEFAULT_STACKING = _freeze({"group": "A", "mode": "none"})
+
+_TS_CUSTOM_DEFAULTS = _freeze({
+    "axisCenteredZero": False,
+    "axisPlacement": "auto",
+    "barAlignment": 0,
+    "drawStyle": "line",
+    "fillOpacity": 10,
+    "gradientMode": "none",
+    "hideFrom": {
+        "legend": False,
+        "tooltip": False,
+        "viz": False,
+    },
+    "lineInterpolation": "linear",
+    "lineWidth": 2,
+    "pointSize": 4,
+    "scaleDistribution": {"type": "linear"},
+    "showPoints": "auto",
+    "spanNulls": False,
+    "stacking": _TS_DEFAULT_STACKING,
+    "thresholdsStyle": {"mode": "off"},
+})
+
+_TS_THRESHOLDS = _freeze({
+    "mode": "absolute",
+    "steps": [
+        {"color": "green", "value": None},
+        {"color": "red", "value": None},
+    ],
+})
+
+_TS_OPTIONS = _freeze({
+    "legend": {
+        "calcs": [],
+        "displayMode": "list",
+        "placement": "bottom",
+        "hideEmpty": True,
+        "hideZero": True,
+    },
+    "tooltip": {"mode": "multi", "sort": "desc"},
+})
+
+_TABLE_TRANSFORMS_SKELETON = _freeze({"id": "merge", "options": {}})
+
+_TABLE_FIELD_DEFAULTS = _freeze({
+    "custom": {"align": "auto", "displayMode": "auto"},
+    "mappings": [],
+    "thresholds": {
+        "mode": "absolute",
+        "steps": [{"color": "green", "value": None}],
+    },
+})
+
+_TABLE_OPTIONS = _freeze({
+    "footer": {"enable": False, "fields": "", "reducer": ["sum"]},
+    "showHeader": True,
+})
+
+def _mk_target(
+    expr: str,
+    idx: int,
+    legend: str = "",
+    interval: str = "",
+    instant: bool = False,
+    fmt: str | None = None,
+) -> dict:
+    target = {
+        "datasource": PROM_DS,
+        "expr": expr,
+        "interval": interval,
+        "legendFormat": legend,
+        "refId": _REFIDS[idx],
+    }
+    if instant:
+        target["instant"] = True
+    if fmt:
+        target["format"] = fmt
+    return target
+
+def row(panel_id: int, title: str, y: int, x: int = 0, w: int = 24, h: int = 1) -> dict:
     return {
         "collapsed": False,
-        "gridPos": {"h": 1, "w": 24, "x": 0, "y": y},
+        "gridPos": {"h": h, "w": w, "x": x, "y": y},
         "id": panel_id,
         "panels": [],
         "title": title,
@@ -25,10 +140,7 @@ def stat(
     thresholds: list | None = None,
     description: str = "",
 ) -> dict:
-    thresholds = thresholds or [
-        {"color": "green", "value": None},
-        {"color": "red", "value": 1},
-    ]
+    thresholds = thresholds or _STAT_DEFAULT_THRESHOLDS
 
     return {
         "datasource": PROM_DS,
@@ -46,18 +158,7 @@ def stat(
         },
         "gridPos": {"h": h, "w": w, "x": x, "y": y},
         "id": panel_id,
-        "options": {
-            "colorMode": "value",
-            "graphMode": "none",
-            "justifyMode": "center",
-            "orientation": "horizontal",
-            "reduceOptions": {
-                "calcs": ["lastNotNull"],
-                "fields": "",
-                "values": False,
-            },
-            "textMode": "auto",
-        },
+        "options": _STAT_OPTIONS,
         "targets": [
             {
                 "datasource": PROM_DS,
@@ -86,55 +187,27 @@ def timeseries(
     color_mode: str = "palette-classic",
     description: str = "",
 ) -> dict:
-    stacking = stacking or {"group": "A", "mode": "none"}
-
-    panel_targets = []
-    for idx, target in enumerate(targets):
-        t = {
-            "datasource": PROM_DS,
-            "expr": target["expr"],
-            "interval": target.get("interval", ""),
-            "legendFormat": target.get("legend", ""),
-            "refId": chr(65 + idx),
-        }
-        if target.get("instant"):
-            t["instant"] = True
-        panel_targets.append(t)
+    custom = {**_TS_CUSTOM_DEFAULTS, "stacking": stacking} if stacking else _TS_CUSTOM_DEFAULTS
+
+    panel_targets = [
+        _mk_target(
+            t["expr"],
+            idx,
+            legend=t.get("legend", ""),
+            interval=t.get("interval", ""),
+            instant=t.get("instant", False),
+        )
+        for idx, t in enumerate(targets)
+    ]
 
     return {
         "datasource": PROM_DS,
         "fieldConfig": {
             "defaults": {
                 "color": {"mode": color_mode},
-                "custom": {
-                    "axisCenteredZero": False,
-                    "axisPlacement": "auto",
-                    "barAlignment": 0,
-                    "drawStyle": "line",
-                    "fillOpacity": 10,
-                    "gradientMode": "none",
-                    "hideFrom": {
-                        "legend": False,
-                        "tooltip": False,
-                        "viz": False,
-                    },
-                    "lineInterpolation": "linear",
-                    "lineWidth": 2,
-                    "pointSize": 4,
-                    "scaleDistribution": {"type": "linear"},
-                    "showPoints": "auto",
-                    "spanNulls": False,
-                    "stacking": stacking,
-                    "thresholdsStyle": {"mode": "off"},
-                },
+                "custom": custom,
                 "mappings": [],
-                "thresholds": {
-                    "mode": "absolute",
-                    "steps": [
-                        {"color": "green", "value": None},
-                        {"color": "red", "value": None},
-                    ],
-                },
+                "thresholds": _TS_THRESHOLDS,
                 "unit": unit,
                 "noValue": "No data",
             },
@@ -142,16 +215,7 @@ def timeseries(
         },
         "gridPos": {"h": h, "w": w, "x": x, "y": y},
         "id": panel_id,
-        "options": {
-            "legend": {
-                "calcs": [],
-                "displayMode": "list",
-                "placement": "bottom",
-                "hideEmpty": True,
-                "hideZero": True,
-            },
-            "tooltip": {"mode": "multi", "sort": "desc"},
-        },
+        "options": _TS_OPTIONS,
         "targets": panel_targets,
         "title": title,
         "description": description,
@@ -301,27 +365,18 @@ def table(
     field_overrides: list | None = None,
 ) -> dict:
     rename = rename or {}
-    exclude_columns = exclude_columns or []
     field_overrides = field_overrides or []
-    panel_targets = []
-    for idx, t in enumerate(targets):
-        target = {
-            "datasource": PROM_DS,
-            "expr": t["expr"],
-            "format": "table",
-            "instant": True,
-            "interval": "",
-            "legendFormat": "",
-            "refId": chr(65 + idx),
-        }
-        panel_targets.append(target)
+    panel_targets = [
+        _mk_target(t["expr"], idx, instant=True, fmt="table")
+        for idx, t in enumerate(targets)
+    ]
 
     exclude_by_name = {"Time": True}
-    for col in exclude_columns:
-        exclude_by_name[col] = True
+    if exclude_columns:
+        exclude_by_name.update(dict.fromkeys(exclude_columns, True))
 
     transformations = [
-        {"id": "merge", "options": {}},
+        _TABLE_TRANSFORMS_SKELETON,
         {
             "id": "organize",
             "options": {
@@ -334,22 +389,12 @@ def table(
     return {
         "datasource": PROM_DS,
         "fieldConfig": {
-            "defaults": {
-                "custom": {"align": "auto", "displayMode": "auto"},
-                "mappings": [],
-                "thresholds": {
-                    "mode": "absolute",
-                    "steps": [{"color": "green", "value": None}],
-                },
-            },
+            "defaults": _TABLE_FIELD_DEFAULTS,
             "overrides": field_overrides,
         },
         "gridPos": {"h": h, "w": 24, "x": x, "y": y},
         "id": panel_id,
-        "options": {
-            "footer": {"enable": False, "fields": "", "reducer": ["sum"]},
-            "showHeader": True,
-        },
+        "options": _TABLE_OPTIONS,
         "pluginVersion": "10.0.0",
         "targets": panel_targets,
         "title": title,
@@ -358,75 +403,109 @@ def table(
         "type": "table",
     }
 
-def dashboard_definition() -> dict:
-    panels = []
-    y = 0
+# PromQL label selectors shared by the panel queries.
+_JI = '{job="$job", instance=~"$instance"}'
+_JIS = '{job="$job", instance=~"$instance", source=~"$source"}'
+_JISP = '{job="$job", instance=~"$instance", source=~"$source", pair=~"$pair"}'
+# Single-source variant for panels repeated per $source value.
+_JI_SRC_P = '{job="$job", instance=~"$instance", source="$source", pair=~"$pair"}'
 
-    # 1. Service Overview - Quick pulse to see if service is alive
-    panels.append(row(1, "Service Overview", y))
-    y += 1
-    panels.append(stat(2, "Requests/s", "sum(increase(http_requests_total{job=\"$job\", instance=~\"$instance\"}[$__range])) / $__range_s", "reqps", 0, y, thresholds=[{"color": "red", "value": 0}, {"color": "green", "value": 0.1}], description="Average HTTP requests per second over the selected time range. Should be > 0 if service is receiving traffic."))
-    panels.append(stat(3, "Latency P95", "histogram_quantile(0.95, sum(increase(http_request_duration_seconds_bucket{job=\"$job\", instance=~\"$instance\"}[$__range])) by (le))", "s", 6, y, thresholds=[{"color": "green", "value": None}, {"color": "red", "value": 1}], description="95th percentile of HTTP request latency over the selected time range. Values > 1s indicate performance issues."))
-    panels.append(stat(4, "Errors/s", "sum(rate(app_errors_total{job=\"$job\", instance=~\"$instance\"}[1m]))", "ops", 12, y, thresholds=[{"color": "green", "value": None}, {"color": "red", "value": 0.1}], description="Application errors per second. Should be 0 or very low in healthy system."))
-    panels.append(stat(5, "Uptime", "min(up{job=\"$job\", instance=~\"$instance\"})", "percentunit", 18, y, thresholds=[{"color": "red", "value": None}, {"color": "green", "value": 1}], description="Service availability. 1 = up, 0 = down. All instances should be up."))
-    y += 4
+GRID_WIDTH = 24
+
+# Extra vertical space left below a panel kind before the next line starts.
+_BOTTOM_GUTTER = {"timeseries": 1, "stat_grid_with_repeat": 1}
+
+# Stat panel rows: (panel_id, title, expr, unit, thresholds, description).
+# Each section shows four of them side by side.
+def _stat_spec(panel_id: int, title: str, expr: str, unit: str, thresholds: list, description: str) -> tuple:
+    return ("stat", panel_id, 6, 4, (title, expr, unit), {"thresholds": thresholds, "description": description})
+
+SERVICE_STATS = [
+    (2, "Requests/s", f"sum(increase(http_requests_total{_JI}[$__range])) / $__range_s", "reqps", [{"color": "red", "value": 0}, {"color": "green", "value": 0.1}], "Average HTTP requests per second over the selected time range. Should be > 0 if service is receiving traffic."),
+    (3, "Latency P95", f"histogram_quantile(0.95, sum(increase(http_request_duration_seconds_bucket{_JI}[$__range])) by (le))", "s", [{"color": "green", "value": None}, {"color": "red", "value": 1}], "95th percentile of HTTP request latency over the selected time range. Values > 1s indicate performance issues."),
+    (4, "Errors/s", f"sum(rate(app_errors_total{_JI}[1m]))", "ops", [{"color": "green", "value": None}, {"color": "red", "value": 0.1}], "Application errors per second. Should be 0 or very low in healthy system."),
+    (5, "Uptime", f"min(up{_JI})", "percentunit", [{"color": "red", "value": None}, {"color": "green", "value": 1}], "Service availability. 1 = up, 0 = down. All instances should be up."),
+]
+
+CACHE_STATS = [
+    (11, "Total Cache Size", f"sum(cache_size{_JIS})", "short", [{"color": "red", "value": 0}, {"color": "green", "value": 1}], "Total number of cached price entries. Should be > 0 if cache is working."),
+    (12, "Hit Ratio", f"sum(increase(cache_hits_total{_JIS}[$__range])) / clamp_min(sum(increase(cache_hits_total{_JIS}[$__range]) + increase(cache_misses_total{_JIS}[$__range])), 0.00001)", "percentunit", [{"color": "red", "value": None}, {"color": "orange", "value": 0.8}, {"color": "green", "value": 0.95}], "Cache hit ratio over the entire selected time range. Higher is better. >95% is excellent, <80% indicates cache issues."),
+    (13, "Tracked Pairs", f"sum(tracked_pairs_total{_JI})", "short", [{"color": "red", "value": 0}, {"color": "green", "value": 1}], "Number of trading pairs currently being tracked and cached."),
+    (14, "Unique Pairs", f"pairs_total{_JI}", "short", [{"color": "red", "value": 0}, {"color": "green", "value": 1}], "Total unique trading pairs configured in the system."),
+]
 
-    panels.append(timeseries(6, "Request Breakdown", [{"expr": "sum(rate(http_requests_total{job=\"$job\", instance=~\"$instance\"}[1m])) by (route)", "legend": "{{route}}"}], 0, y, w=24, unit="reqps", description="HTTP requests per second broken down by route. Shows which endpoints are being used most."))
-    y += 8
+UPDATE_STATS = [
+    (21, "Max Update Interval", f"histogram_quantile(0.95, sum(rate(price_update_frequency_seconds_bucket{_JISP}[5m])) by (le))", "s", [{"color": "green", "value": None}, {"color": "yellow", "value": 30}, {"color": "red", "value": 60}], "95th percentile of price update intervals. Shows how often prices are updated. >60s indicates slow updates."),
+    (22, "WS Connections", f"sum(websocket_connections_total{_JIS})", "short", [{"color": "green", "value": None}, {"color": "red", "value": 0}], "Active WebSocket connections to price sources. Should be > 0 for real-time updates."),
+    (23, "WS Messages/s", f"sum(rate(websocket_messages_received_total{_JIS}[1m]))", "ops", [{"color": "green", "value": None}, {"color": "red", "value": 0}], "WebSocket messages received per second. Indicates real-time data flow."),
+    (24, "Quotes Processed/s", 'sum(rate(quotes_processed_total{job="$job", instance=~"$instance", source=~"$source", status="success"}[1m]))', "ops", [{"color": "green", "value": None}, {"color": "red", "value": 0}], "Successfully processed price quotes per second. Should be > 0 for active trading pairs."),
+]
+
+# Declarative dashboard content: (kind, panel_id, w, h, args, kwargs).
+# Panels are laid out left to right and wrap onto a new line once the grid
+# width is exhausted; see _layout().
+PANEL_SPECS = [
+    # 1. Service Overview - Quick pulse to see if service is alive
+    ("row", 1, 24, 1, ("Service Overview",), {}),
+    *starmap(_stat_spec, SERVICE_STATS),
+    ("timeseries", 6, 24, 7, ("Request Breakdown", [{"expr": f"sum(rate(http_requests_total{_JI}[1m])) by (route)", "legend": "{{route}}"}]), {"unit": "reqps", "description": "HTTP requests per second broken down by route. Shows which endpoints are being used most."}),
 
     # 2. Cache Health - Core focus: Is cache populated and used?
-    panels.append(row(10, "Cache Health", y))
-    y += 1
-    panels.append(stat(11, "Total Cache Size", "sum(cache_size{job=\"$job\", instance=~\"$instance\", source=~\"$source\"})", "short", 0, y, thresholds=[{"color": "red", "value": 0}, {"color": "green", "value": 1}], description="Total number of cached price entries. Should be > 0 if cache is working."))
-    panels.append(stat(12, "Hit Ratio", "sum(increase(cache_hits_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[$__range])) / clamp_min(sum(increase(cache_hits_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[$__range]) + increase(cache_misses_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[$__range])), 0.00001)", "percentunit", 6, y, thresholds=[{"color": "red", "value": None}, {"color": "orange", "value": 0.8}, {"color": "green", "value": 0.95}], description="Cache hit ratio over the entire selected time range. Higher is better. >95% is excellent, <80% indicates cache issues."))
-    panels.append(stat(13, "Tracked Pairs", "sum(tracked_pairs_total{job=\"$job\", instance=~\"$instance\"})", "short", 12, y, thresholds=[{"color": "red", "value": 0}, {"color": "green", "value": 1}], description="Number of trading pairs currently being tracked and cached."))
-    panels.append(stat(14, "Unique Pairs", "pairs_total{job=\"$job\", instance=~\"$instance\"}", "short", 18, y, thresholds=[{"color": "red", "value": 0}, {"color": "green", "value": 1}], description="Total unique trading pairs configured in the system."))
-    y += 4
-
-    panels.append(timeseries(15, "Cache Hits vs Misses", [
-        {"expr": "sum(rate(cache_hits_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m])) by (source)", "legend": "Hits {{source}}"},
-        {"expr": "sum(rate(cache_misses_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m])) by (source)", "legend": "Misses {{source}}"}
-    ], 0, y, w=12, unit="ops", stacking={"mode": "normal"}, description="Cache hits vs misses per source. More hits = better performance. High misses indicate cache problems."))
-    panels.append(timeseries(16, "Cache Size Trend", [{"expr": "sum(cache_size{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}) by (source)", "legend": "{{source}}"}], 12, y, w=12, unit="short", stacking={"mode": "normal"}, description="Number of cached entries over time by source. Should grow initially then stabilize."))
-    y += 8
+    ("row", 10, 24, 1, ("Cache Health",), {}),
+    *starmap(_stat_spec, CACHE_STATS),
+    ("timeseries", 15, 12, 7, ("Cache Hits vs Misses", [
+        {"expr": f"sum(rate(cache_hits_total{_JIS}[1m])) by (source)", "legend": "Hits {{source}}"},
+        {"expr": f"sum(rate(cache_misses_total{_JIS}[1m])) by (source)", "legend": "Misses {{source}}"}
+    ]), {"unit": "ops", "stacking": {"mode": "normal"}, "description": "Cache hits vs misses per source. More hits = better performance. High misses indicate cache problems."}),
+    ("timeseries", 16, 12, 7, ("Cache Size Trend", [{"expr": f"sum(cache_size{_JIS}) by (source)", "legend": "{{source}}"}]), {"unit": "short", "stacking": {"mode": "normal"}, "description": "Number of cached entries over time by source. Should grow initially then stabilize."}),
 
     # 3. Update Mechanisms - Are prices updating?
-    panels.append(row(20, "Update Mechanisms", y))
-    y += 1
-    panels.append(stat(21, "Max Update Interval", "histogram_quantile(0.95, sum(rate(price_update_frequency_seconds_bucket{job=\"$job\", instance=~\"$instance\", source=~\"$source\", pair=~\"$pair\"}[5m])) by (le))", "s", 0, y, thresholds=[{"color": "green", "value": None}, {"color": "yellow", "value": 30}, {"color": "red", "value": 60}], description="95th percentile of price update intervals. Shows how often prices are updated. >60s indicates slow updates."))
-    panels.append(stat(22, "WS Connections", "sum(websocket_connections_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"})", "short", 6, y, thresholds=[{"color": "green", "value": None}, {"color": "red", "value": 0}], description="Active WebSocket connections to price sources. Should be > 0 for real-time updates."))
-    panels.append(stat(23, "WS Messages/s", "sum(rate(websocket_messages_received_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m]))", "ops", 12, y, thresholds=[{"color": "green", "value": None}, {"color": "red", "value": 0}], description="WebSocket messages received per second. Indicates real-time data flow."))
-    panels.append(stat(24, "Quotes Processed/s", "sum(rate(quotes_processed_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\", status=\"success\"}[1m]))", "ops", 18, y, thresholds=[{"color": "green", "value": None}, {"color": "red", "value": 0}], description="Successfully processed price quotes per second. Should be > 0 for active trading pairs."))
-    y += 4
+    ("row", 20, 24, 1, ("Update Mechanisms",), {}),
+    *starmap(_stat_spec, UPDATE_STATS),
+    ("timeseries", 25, 12, 7, ("Update Frequency P95", [{"expr": f"histogram_quantile(0.95, sum(rate(price_update_frequency_seconds_bucket{_JISP}[1m])) by (le, source))", "legend": "{{source}}"}]), {"unit": "s", "description": "95th percentile of price update intervals by source. Lower is better for real-time data."}),
+    ("timeseries", 26, 12, 7, ("Update Interval Trend", [{"expr": f"histogram_quantile(0.5, sum(rate(price_update_frequency_seconds_bucket{_JISP}[1m])) by (le, source))", "legend": "{{source}}"}]), {"unit": "s", "description": "Median price update intervals by source. Shows how frequently prices are updated."}),
+    ("stat_grid_with_repeat", 27, 8, 8, ("$source", f"histogram_quantile(0.5, sum(rate(price_update_frequency_seconds_bucket{_JI_SRC_P}[5m])) by (le, pair))"), {"unit": "s", "description": "Median update intervals for trading pairs by source. Green <30s, Yellow 30-60s, Red >60s."}),
 
-    panels.append(timeseries(25, "Update Frequency P95", [{"expr": "histogram_quantile(0.95, sum(rate(price_update_frequency_seconds_bucket{job=\"$job\", instance=~\"$instance\", source=~\"$source\", pair=~\"$pair\"}[1m])) by (le, source))", "legend": "{{source}}"}], 0, y, w=12, unit="s", description="95th percentile of price update intervals by source. Lower is better for real-time data."))
-    panels.append(timeseries(26, "Update Interval Trend", [{"expr": "histogram_quantile(0.5, sum(rate(price_update_frequency_seconds_bucket{job=\"$job\", instance=~\"$instance\", source=~\"$source\", pair=~\"$pair\"}[1m])) by (le, source))", "legend": "{{source}}"}], 12, y, w=12, unit="s", description="Median price update intervals by source. Shows how frequently prices are updated."))
-    y += 8
+    # 4. Source Reliability - Why might cache be stale?
+    ("row", 30, 24, 1, ("Source Reliability",), {}),
+    ("timeseries", 31, 12, 7, ("API Errors", [{"expr": f"sum(rate(source_api_errors_total{_JIS}[1m])) by (source)", "legend": "{{source}}"}]), {"unit": "ops", "description": "API errors per second by source. Should be 0 or very low. High values indicate source problems."}),
+    ("timeseries", 32, 12, 7, ("Rate Limit Hits", [{"expr": f"sum(rate(rate_limit_hits_total{_JIS}[1m])) by (source)", "legend": "{{source}}"}]), {"unit": "ops", "description": "Rate limit hits per second by source. High values may cause data staleness."}),
+    ("timeseries", 33, 12, 7, ("Fetch Latency P95", [{"expr": f"histogram_quantile(0.95, sum(rate(source_fetch_duration_seconds_bucket{_JIS}[1m])) by (le, source))", "legend": "{{source}}"}]), {"unit": "s", "description": "95th percentile of API fetch latency by source. High values may indicate network or source issues."}),
+    ("timeseries", 34, 12, 7, ("Price Not Found", [{"expr": f"sum(rate(price_not_found_total{_JISP}[1m])) by (source)", "legend": "{{source}}"}]), {"unit": "ops", "description": "Rate of price not found errors by source. May indicate missing trading pairs on source."}),
 
-    panels.append(stat_grid_with_repeat(27, "$source", "histogram_quantile(0.5, sum(rate(price_update_frequency_seconds_bucket{job=\"$job\", instance=~\"$instance\", source=\"$source\", pair=~\"$pair\"}[5m])) by (le, pair))", 0, y, h=8, unit="s", description="Median update intervals for trading pairs by source. Green <30s, Yellow 30-60s, Red >60s."))
-    y += 9
+    # 5. Runtime Metrics - Basic resource usage
+    ("row", 40, 24, 1, ("Runtime Metrics",), {}),
+    ("timeseries", 41, 12, 7, ("CPU Usage", [{"expr": f"rate(process_cpu_seconds_total{_JI}[1m]) * 100", "legend": "CPU %"}]), {"unit": "percent", "description": "CPU usage percentage. High sustained values may indicate performance bottlenecks."}),
+    ("timeseries", 42, 12, 7, ("Memory Usage", [{"expr": f"process_resident_memory_bytes{_JI}", "legend": "RSS"}]), {"unit": "bytes", "description": "Resident memory usage. Steady growth may indicate memory leaks."}),
+    ("timeseries", 43, 12, 7, ("Event Loop Lag P99", [{"expr": f"histogram_quantile(0.99, sum(rate(nodejs_eventloop_lag_seconds_bucket{_JI}[5m])) by (le))", "legend": "Lag P99"}]), {"unit": "s", "description": "99th percentile of event loop lag. High values indicate blocking operations affecting responsiveness."}),
+    ("timeseries", 44, 12, 7, ("GC Duration P95", [{"expr": f"histogram_quantile(0.95, sum(rate(nodejs_gc_duration_seconds_bucket{_JI}[1m])) by (le))", "legend": "GC P95"}]), {"unit": "s", "description": "95th percentile of garbage collection duration. Long GC pauses can affect performance."}),
+]
 
-    # 4. Source Reliability - Why might cache be stale?
-    panels.append(row(30, "Source Reliability", y))
-    y += 1
-    panels.append(timeseries(31, "API Errors", [{"expr": "sum(rate(source_api_errors_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m])) by (source)", "legend": "{{source}}"}], 0, y, w=12, unit="ops", description="API errors per second by source. Should be 0 or very low. High values indicate source problems."))
-    panels.append(timeseries(32, "Rate Limit Hits", [{"expr": "sum(rate(rate_limit_hits_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m])) by (source)", "legend": "{{source}}"}], 12, y, w=12, unit="ops", description="Rate limit hits per second by source. High values may cause data staleness."))
-    y += 8
+def _layout(specs: list[tuple]) -> list[tuple[int, int]]:
+    positions = []
+    x = y = line_h = 0
+    for kind, _, w, h, _, _ in specs:
+        if x + w > GRID_WIDTH:
+            x, y, line_h = 0, y + line_h, 0
+        positions.append((x, y))
+        x += w
+        line_h = max(line_h, h + _BOTTOM_GUTTER.get(kind, 0))
+    return positions
 
-    panels.append(timeseries(33, "Fetch Latency P95", [{"expr": "histogram_quantile(0.95, sum(rate(source_fetch_duration_seconds_bucket{job=\"$job\", instance=~\"$instance\", source=~\"$source\"}[1m])) by (le, source))", "legend": "{{source}}"}], 0, y, w=12, unit="s", description="95th percentile of API fetch latency by source. High values may indicate network or source issues."))
-    panels.append(timeseries(34, "Price Not Found", [{"expr": "sum(rate(price_not_found_total{job=\"$job\", instance=~\"$instance\", source=~\"$source\", pair=~\"$pair\"}[1m])) by (source)", "legend": "{{source}}"}], 12, y, w=12, unit="ops", description="Rate of price not found errors by source. May indicate missing trading pairs on source."))
-    y += 8
+PANEL_LAYOUT = _layout(PANEL_SPECS)
 
-    # 5. Runtime Metrics - Basic resource usage
-    panels.append(row(40, "Runtime Metrics", y))
-    y += 1
-    panels.append(timeseries(41, "CPU Usage", [{"expr": "rate(process_cpu_seconds_total{job=\"$job\", instance=~\"$instance\"}[1m]) * 100", "legend": "CPU %"}], 0, y, w=12, unit="percent", description="CPU usage percentage. High sustained values may indicate performance bottlenecks."))
-    panels.append(timeseries(42, "Memory Usage", [{"expr": "process_resident_memory_bytes{job=\"$job\", instance=~\"$instance\"}", "legend": "RSS"}], 12, y, w=12, unit="bytes", description="Resident memory usage. Steady growth may indicate memory leaks."))
-    y += 8
+BUILDERS = {
+    "row": row,
+    "stat": stat,
+    "timeseries": timeseries,
+    "stat_grid_with_repeat": stat_grid_with_repeat,
+}
 
-    panels.append(timeseries(43, "Event Loop Lag P99", [{"expr": "histogram_quantile(0.99, sum(rate(nodejs_eventloop_lag_seconds_bucket{job=\"$job\", instance=~\"$instance\"}[5m])) by (le))", "legend": "Lag P99"}], 0, y, w=12, unit="s", description="99th percentile of event loop lag. High values indicate blocking operations affecting responsiveness."))
-    panels.append(timeseries(44, "GC Duration P95", [{"expr": "histogram_quantile(0.95, sum(rate(nodejs_gc_duration_seconds_bucket{job=\"$job\", instance=~\"$instance\"}[1m])) by (le))", "legend": "GC P95"}], 12, y, w=12, unit="s", description="95th percentile of garbage collection duration. Long GC pauses can affect performance."))
-    y += 8
+def dashboard_definition() -> dict:
+    panels = [
+        BUILDERS[kind](panel_id, *args, x=x, y=y, w=w, h=h, **kwargs)
+        for (kind, panel_id, w, h, args, kwargs), (x, y) in zip(PANEL_SPECS, PANEL_LAYOUT)
+    ]
 
     dashboard = {
         "__inputs": [
@@ -454,9 +533,9 @@ def dashboard_definition() -> dict:
         "templating": {
             "list": [
                 {"current": {"selected": True, "text": "price-aggregator", "value": "price-aggregator"}, "datasource": PROM_DS, "definition": "label_values(up, job)", "hide": 2, "includeAll": False, "multi": False, "name": "job", "query": {"query": "label_values(up, job)", "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
-                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": "label_values(up{job=\"$job\"}, instance)", "hide": 0, "includeAll": True, "multi": True, "name": "instance", "query": {"query": "label_values(up{job=\"$job\"}, instance)", "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
-                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": "label_values(quotes_processed_total{job=\"$job\"}, source)", "hide": 0, "includeAll": True, "multi": True, "name": "source", "query": {"query": "label_values(quotes_processed_total{job=\"$job\"}, source)", "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
-                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": "label_values(price_update_frequency_seconds_bucket{job=\"$job\"}, pair)", "hide": 0, "includeAll": True, "multi": True, "name": "pair", "query": {"query": "label_values(price_update_frequency_seconds_bucket{job=\"$job\"}, pair)", "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
+                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": 'label_values(up{job="$job"}, instance)', "hide": 0, "includeAll": True, "multi": True, "name": "instance", "query": {"query": 'label_values(up{job="$job"}, instance)', "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
+                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": 'label_values(quotes_processed_total{job="$job"}, source)', "hide": 0, "includeAll": True, "multi": True, "name": "source", "query": {"query": 'label_values(quotes_processed_total{job="$job"}, source)', "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
+                {"current": {"selected": True, "text": "All", "value": "$__all"}, "datasource": PROM_DS, "definition": 'label_values(price_update_frequency_seconds_bucket{job="$job"}, pair)', "hide": 0, "includeAll": True, "multi": True, "name": "pair", "query": {"query": 'label_values(price_update_frequency_seconds_bucket{job="$job"}, pair)', "refId": "StandardVariableQuery"}, "refresh": 1, "regex": "", "skipUrlSync": False, "sort": 0, "type": "query"},
             ]
         },
         "time": {"from": "now-30m", "to": "now"},
@@ -471,11 +550,34 @@ def dashboard_definition() -> dict:
     return dashboard
 
 def main() -> None:
+    # --compact skips pretty-printing, e.g. for CI regeneration.
+    compact = "--compact" in sys.argv[1:]
     dashboard = dashboard_definition()
     output_path = "./price-aggregator-dashboard.json"
-    with open(output_path, "w", encoding="utf-8") as fp:
-        json.dump(dashboard, fp, indent=2)
-        fp.write("\n")
+    option = orjson.OPT_APPEND_NEWLINE
+    if not compact:
+        option |= orjson.OPT_INDENT_2
+    # Encode straight to a single bytes buffer; no intermediate str chunks
+    # or trailing-newline copy.
+    # default=dict serializes the frozen MappingProxyType fragments.
+    data = orjson.dumps(dashboard, default=dict, option=option)
+    # The output is deterministic; leave an identical file untouched so its
+    # mtime stays stable for anything caching on it. The size check avoids
+    # reading the old file back when it obviously differs.
+    try:
+        if os.path.getsize(output_path) == len(data):
+            with open(output_path, "rb") as fp:
+                if fp.read() == data:
+                    return
+    except FileNotFoundError:
+        pass
+    fd = os.open(output_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
 
 if __name__ == "__main__":
     main()